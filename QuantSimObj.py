@@ -65,6 +65,10 @@ class QuantSim:
         self.wfn = None
         self.energy = None
         self.sim_params = None
+        self._cache = {}  # constants memoized by QuantVisualizer, see set_sim_params
+        self._wfn_buf = None  # output arrays reused by QuantVisualizer across simulate() calls
+        self._prob_buf = None
+        self._tmp_buf = None  # float64 scratch space for QuantVisualizer's numpy fallbacks
         
         # begin by identifying quantum system
         print("\n" + "~"*100)
@@ -84,32 +88,33 @@ class QuantSim:
         """
         # start quantsim initialization by determining what system to run
         # if user does not specify, then choice defualts to "none" and we will prompt
-        if choice == "none":
-            choice = input("""Please pick a system to simulate:
+        # loop until a known system is given instead of calling this method again
+        while True:
+            if choice == "none":
+                choice = input("""Please pick a system to simulate:
                                 \n[1] Infinite Square Well
                                 \n[2] Quantum Harmonic Oscillator (Quadratic Potential Well)
                                 \n    Enter a number from 1-2: """)
+                
+            # save choice in object param, whether prespecified or from prompt
+            self.sys = choice 
             
-        # save choice in object param, whether prespecified or from prompt
-        self.sys = choice 
-        
-        # use if/elif/else and if in to emulate a switch/case and assign correct values
-        if choice in ["1", "Infinite Square Well", "ISW"]:
-            self.wfn = "\sqrt(\\frac{L}{2}) sin(k_n x) e^{i E_n t/ \hbar}"
-            self.energy = "\\frac{n^2 \hbar^2 \pi^2}{2 m L^2}"
-            print("\nInfinite Square Well chosen.")
-        
-        elif choice in ["2", "Quantum Harmonic Oscillator", "QHO"]:
-            self.wfn = "\frac{1}{/sqrt{2^n n!}} (\frac{m \omega}{\pi \hbar})^{\frac{1}{4}} e^{- 
-\frac{m \omega x^2}{2 \hbar} H_n( \sqrt{ \frac{m \omega}{\hbar} x) "
-            self.energy = "(2n + 1) \frac {\hbar \omega} {2}"        
-            print("\nQuantum Harmonic Oscillator in a Parabolic Square Well chosen.")
-        
-        else:
-            print("\nSystem not found. Please retry.\n")
-            self.identify_sys()  # run this method again with default param
-
-        return
+            # use if/elif/else and if in to emulate a switch/case and assign correct values
+            if choice in ["1", "Infinite Square Well", "ISW"]:
+                self.wfn = "\sqrt(\\frac{L}{2}) sin(k_n x) e^{i E_n t/ \hbar}"
+                self.energy = "\\frac{n^2 \hbar^2 \pi^2}{2 m L^2}"
+                print("\nInfinite Square Well chosen.")
+                return
+            
+            elif choice in ["2", "Quantum Harmonic Oscillator", "QHO"]:
+                self.wfn = "\frac{1}{/sqrt{2^n n!}} (\frac{m \omega}{\pi \hbar})^{\frac{1}{4}} e^{- \frac{m \omega x^2}{2 \hbar} H_n( \sqrt{ \frac{m \omega}{\hbar} x) "
+                self.energy = "(2n + 1) \frac {\hbar \omega} {2}"        
+                print("\nQuantum Harmonic Oscillator in a Parabolic Square Well chosen.")
+                return
+            
+            else:
+                print("\nSystem not found. Please retry.\n")
+                choice = "none"  # prompt again on the next pass
     
     
     def set_sim_params(self, use_default=True):
@@ -126,31 +131,38 @@ class QuantSim:
         None
 
         """
-        choice = self.sys
-        
-        # default values for simulation
-        self.sim_params = {
-            'mass' : 1,  
-            'energy' : 1, 
-            'length' : 12, 
-            'dx' : 0.05, 
-        }  
+        # any constants QuantVisualizer cached were built from the old params
+        self._cache = {}
         
-        # go through each system's unique values, set defaults
-        if choice in ["1", "Infinite Square Well", "ISW"]:
-            self.sim_params['num_modes'] = 4  # number of modes
-            self.sim_params['xlims'] = [0, self.sim_params['length']]  # number of modes
-            self.sim_params['ylims'] = [-3, 3]  # number of modes
-
-        elif choice in ["2", "Quantum Harmonic Oscillator", "QHO"]:
-            self.sim_params['num_modes'] = 3  # number of modes
-            self.sim_params['force_constant_k'] = 3  # 1/2 K x^2
-            self.sim_params['xlims'] = [-4, 4]  # number of modes
-            self.sim_params['ylims'] = [-1, 1.5]  # number of modes
-                                        
-        else:
-            print("\nSystem not found. Please retry.\n")
-            self.set_sim_params()  # restart method
+        # loop until self.sys is a known system instead of calling this method again
+        while True:
+            choice = self.sys
+            
+            # default values for simulation
+            self.sim_params = {
+                'mass' : 1,  
+                'energy' : 1, 
+                'length' : 12, 
+                'dx' : 0.05, 
+            }  
+            
+            # go through each system's unique values, set defaults
+            if choice in ["1", "Infinite Square Well", "ISW"]:
+                self.sim_params['num_modes'] = 4  # number of modes
+                self.sim_params['xlims'] = [0, self.sim_params['length']]  # number of modes
+                self.sim_params['ylims'] = [-3, 3]  # number of modes
+                break
+    
+            elif choice in ["2", "Quantum Harmonic Oscillator", "QHO"]:
+                self.sim_params['num_modes'] = 3  # number of modes
+                self.sim_params['force_constant_k'] = 3  # 1/2 K x^2
+                self.sim_params['xlims'] = [-4, 4]  # number of modes
+                self.sim_params['ylims'] = [-1, 1.5]  # number of modes
+                break
+                                            
+            else:
+                print("\nSystem not found. Please retry.\n")
+                self.identify_sys()  # prompt for a new system, then set its defaults
         
         # double check if user wants to use defaults or not
         if bool(use_default) == True:
@@ -167,12 +179,20 @@ class QuantSim:
             # loop over every existing default key in dict, then prompt for value
             for key in self.sim_params:
                 if key not in ['xlims', 'ylims']:
-                    user_input = input("    Enter value for {}, default is [{}]. ".format(key, self.sim_params[key]))
-                    if user_input == "":   # if input is empty, do not save it to dict
-                        print("        Keeping default {}".format(self.sim_params[key]))
-                    else:
+                    # keep asking until the value can be cast to the default's type
+                    while True:
+                        user_input = input("    Enter value for {}, default is [{}]. ".format(key, self.sim_params[key]))
+                        if user_input == "":   # if input is empty, do not save it to dict
+                            print("        Keeping default {}".format(self.sim_params[key]))
+                            break
+                        try:
+                            value = type(self.sim_params[key])(user_input)  # cast to match type!
+                        except ValueError:
+                            print("        {} is not a valid {}, please retry.".format(user_input, type(self.sim_params[key]).__name__))
+                            continue
                         print("        Set {} to {}".format(key, user_input))
-                        self.sim_params[key] = type(self.sim_params[key])(user_input)  # cast to match type!
+                        self.sim_params[key] = value
+                        break
                     
         print("\nFinished setting simulation parameters. Use quantsim.info() to inspect set values. Then, use the QuantSimVisualizer library to qvs.simulate(obj) and qvs.plot_func(obj) to finish!")
         print("\n" + "~"*100)
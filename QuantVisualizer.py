@@ -5,14 +5,154 @@ This is where simulation parameters are important, the user will define for what
 
 """
 
+import math
+
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy as sp
 from scipy import constants, special
 
+# the compiled kernels are optional. prefer numba since its kernels run on
+# every core, then the serial cython build of _kernels.pyx (see setup.py),
+# and without either fall back to plain numpy
+try:
+    from numba import njit, prange
+    KERNEL_BACKEND = "numba"
+except ImportError:
+    try:
+        from _kernels import _isw_fused, _qho_kernel
+        KERNEL_BACKEND = "cython"
+    except ImportError:
+        KERNEL_BACKEND = None
+
 #hbar = sp.constants.hbar
 hbar = 1
 
+# wavefunctions are only plotted, so the output arrays are stored in single precision.
+# everything feeding them (x grid, hermite recurrence) stays in double precision
+PLOT_DTYPE = np.float32
+
+''' begin compiled kernels '''
+
+if KERNEL_BACKEND == "numba":
+    @njit(cache=True, fastmath=True, parallel=True)
+    def _isw_fused(kn, x, amp, wfn_out, prob_out):
+        # write amp*sin(k_n x) and its square in the same pass over memory,
+        # math is done in double precision and only the stores are narrowed
+        nx = x.size
+        for i in prange(kn.size*nx):
+            n = i // nx
+            j = i - n*nx
+            v = amp*math.sin(kn[n]*x[j])
+            wfn_out[n, j] = v
+            prob_out[n, j] = v*v
+
+    @njit(cache=True, fastmath=True, parallel=True)
+    def _qho_kernel(xi, num_modes, alpha, exp_decay, out, prob_out):
+        # run the hermite recurrence pointwise, every x is independent so the
+        # outer loop is split across threads and the mode loop stays serial.
+        # splitting the modes across threads instead would make every thread
+        # rerun the recurrence up to its first mode, O(M^2) work in total.
+        # the probability density is written alongside each amplitude, and
+        # only the stores are narrowed to the dtype of out
+        for i in prange(xi.size):
+            h_prev = 1.0
+            h_cur = 2.0*xi[i]
+            v = alpha[0]*exp_decay[i]
+            out[0, i] = v
+            prob_out[0, i] = v*v
+            if num_modes > 0:
+                v = alpha[1]*h_cur*exp_decay[i]
+                out[1, i] = v
+                prob_out[1, i] = v*v
+            for n in range(1, num_modes):
+                h_next = 2.0*xi[i]*h_cur - 2.0*n*h_prev
+                v = alpha[n+1]*h_next*exp_decay[i]
+                out[n+1, i] = v
+                prob_out[n+1, i] = v*v
+                h_prev = h_cur
+                h_cur = h_next
+
+    # compile once on import so the first simulate() call is not slowed by the jit
+    _isw_fused(np.ones(2), np.zeros(2), 1.0, np.empty((2, 2), PLOT_DTYPE), np.empty((2, 2), PLOT_DTYPE))
+    _qho_kernel(np.zeros(2), 1, np.ones(2), np.ones(2), np.empty((2, 2), PLOT_DTYPE), np.empty((2, 2), PLOT_DTYPE))
+
+
+''' begin helper methods '''
+
+def _get_cached(quantsim, key, factory):
+    """
+    Memoize a per-simulation constant inside the quantsim object. The cache is cleared by quantsim.set_sim_params, and every key should include the sim_params values the constant depends on so that editing sim_params by hand never returns a stale value. Only the latest value of each constant is kept, so changing sim_params between simulate() calls (e.g. animation frames) replaces the old entry instead of growing the cache.
+    
+    Parameters
+    ----------
+        quantsim - QuantSim object
+            should be generated by QuantSimObj.py, then fed into this script
+            
+        key - tuple
+            name of the constant followed by the parameters it was built from, e.g. ('sqrtL2', L)
+            
+        factory - callable
+            zero argument function that computes the constant on a cache miss
+    
+    Returns
+    -------
+        the cached value for key
+    """
+    name, params = key[0], key[1:]
+    cache = quantsim.__dict__.setdefault('_cache', {})
+    entry = cache.get(name)
+    if entry is None or entry[0] != params:
+        # one slot per name, a new parameter set overwrites the old value
+        cache[name] = (params, factory())
+    return cache[name][1]
+
+def _get_buffers(quantsim, shape):
+    """
+    Hand out the wavefunction and probability density arrays stored on the quantsim object, allocating them only when they do not exist yet or the requested shape changed. Repeated simulate() calls, e.g. animation frames, then recompute in place instead of allocating new arrays every frame.
+    
+    Parameters
+    ----------
+        quantsim - QuantSim object
+            should be generated by QuantSimObj.py, then fed into this script
+            
+        shape - tuple of ints
+            (number of modes, number of x values)
+    
+    Returns
+    -------
+        wfn_buf, prob_buf - PLOT_DTYPE numpy arrays of the given shape
+            contents are whatever the previous call left in them
+    """
+    wfn_buf = getattr(quantsim, '_wfn_buf', None)
+    if wfn_buf is None or wfn_buf.shape != shape or wfn_buf.dtype != PLOT_DTYPE:
+        quantsim._wfn_buf = np.empty(shape, dtype=PLOT_DTYPE)
+        quantsim._prob_buf = np.empty_like(quantsim._wfn_buf)
+    return quantsim._wfn_buf, quantsim._prob_buf
+
+def _get_scratch(quantsim, shape):
+    """
+    Hand out the double precision scratch array stored on the quantsim object, reallocating it only when the requested shape changes. Used by the numpy fallbacks for intermediate values that should not be narrowed to PLOT_DTYPE yet.
+    
+    Parameters
+    ----------
+        quantsim - QuantSim object
+            should be generated by QuantSimObj.py, then fed into this script
+            
+        shape - tuple of ints
+            shape of the scratch array
+    
+    Returns
+    -------
+        tmp_buf - float64 numpy array of the given shape
+            contents are whatever the previous call left in it
+    """
+    tmp_buf = getattr(quantsim, '_tmp_buf', None)
+    if tmp_buf is None or tmp_buf.shape != shape:
+        quantsim._tmp_buf = np.empty(shape)
+    return quantsim._tmp_buf
+
+
 ''' begin simulation methods '''
 
 def InfSqWell(quantsim):
@@ -26,10 +166,10 @@ def InfSqWell(quantsim):
     
     Returns
     -------
-        wfn_solns - list of numpy arrays
-            list of multiple numpy arrays. Each numpy array is a solution for the wavefunction amplitude of the schrodinger equation within a InfSqWell. The numpy arrays are ordered by their mode, n, with index 0 being the first mode (n=1) for the InfSqWell.
+        wfn_solns - 2D PLOT_DTYPE numpy array
+            array of shape (num_modes, N). Each row is a solution for the wavefunction amplitude of the schrodinger equation within a InfSqWell. The rows are ordered by their mode, n, with row 0 being the first mode (n=1) for the InfSqWell.
             
-        prob_densities - list of numpy arrays
+        prob_densities - 2D PLOT_DTYPE numpy array
             the squares of each wavefunction amplitude, this gives a normalized probability density.
     """
     
@@ -37,24 +177,35 @@ def InfSqWell(quantsim):
     m = quantsim.sim_params['mass']
     dx = quantsim.sim_params['dx']
     num_of_wfns = quantsim.sim_params['num_modes']
-    wfn_solns, prob_densities, energy_levels = [], [], []
     
     # save x_vals to object, choose num to include end point
-    # want 0 to 10, 0.1 steps; note that num = 10.1/0.1 = 101 data points, [0, 10.1)
-    x_vals = np.linspace(0, L, num=int((L+dx) / dx))  
+    # want 0 to 10, 0.1 steps; note that N = 10/0.1 + 1 = 101 data points, [0, 10]
+    N = int(round(L/dx)) + 1
+    x_vals = np.linspace(0.0, L, N)
     
     # make arrays of constants for each unique wfn
     n_array = np.arange(1, num_of_wfns+1)  # 1 to n+1 to include end point :)
+    kn = np.pi * n_array / L
+    energy_levels = (n_array*np.pi*hbar)**2/(2*m*L**2)
 
-    for n in n_array:
-        kn = np.pi * n / L
-        wfn_ampl = np.sqrt(L/2) * np.sin(kn * x_vals)
-        wfn_solns.append(wfn_ampl)
-        prob_densities.append(np.power(wfn_ampl, 2))
-        energy_levels.append((n*np.pi*hbar)**2/(2*m*L**2))
+    # every mode against every x at once, one row per mode
+    sqrtL2 = _get_cached(quantsim, ('sqrtL2', L), lambda: np.sqrt(L/2))
+    wfn_solns, prob_densities = _get_buffers(quantsim, (num_of_wfns, N))
+    if KERNEL_BACKEND is not None:
+        _isw_fused(kn, x_vals, sqrtL2, wfn_solns, prob_densities)
+    else:
+        # the sin argument is built in a double precision scratch row so only
+        # the final amplitudes are narrowed, and no temporaries are allocated
+        tmp = _get_scratch(quantsim, (N,))
+        for n in range(num_of_wfns):
+            np.multiply(kn[n], x_vals, out=tmp)
+            np.sin(tmp, out=wfn_solns[n])
+            wfn_solns[n] *= sqrtL2
+        np.square(wfn_solns, out=prob_densities)
 
     # save useful arrays in sim_param dict
     quantsim.sim_params['x_vals'] = x_vals
+    quantsim.sim_params['N'] = N
     quantsim.sim_params['E_array'] = energy_levels
     
     return wfn_solns, prob_densities
@@ -70,19 +221,23 @@ def ParabSqWell(quantsim):
     
     Returns
     -------
-        wfn_solns - list of numpy arrays
-            list of multiple numpy arrays. Each numpy array is a solution for the wavefunction amplitude of the schrodinger equation within a InfSqWell. The numpy arrays are ordered by their mode, n, with index 0 being the first mode (n=1) for the InfSqWell.
+        wfn_solns - 2D PLOT_DTYPE numpy array
+            array of shape (num_modes+1, N). Each row is a solution for the wavefunction amplitude of the schrodinger equation within a QHO. The rows are ordered by their mode, n, with row 0 being the ground state (n=0) for the QHO.
             
-        prob_densities - list of numpy arrays
+        prob_densities - 2D PLOT_DTYPE numpy array
             the squares of each wavefunction amplitude, this gives a normalized probability density.
     """
     
-    def hermite(x, n):
-        # define a method that generates the appropriate number 
-        # of hermite polynomial terms, then evaluates them
-        herm_coeffs = np.zeros(n+1)
-        herm_coeffs[n] = 1
-        return np.polynomial.hermite.hermval(x, herm_coeffs)
+    def hermite(xi, num_modes, H):
+        # build every physicist's hermite polynomial H_0...H_num_modes in one
+        # pass using the recurrence H_{n+1} = 2 xi H_n - 2n H_{n-1}, writing
+        # into the (num_modes+1, N) array H
+        H[0] = 1.0
+        if num_modes > 0:
+            H[1] = 2*xi
+        for n in range(1, num_modes):
+            H[n+1] = 2*xi*H[n] - 2*n*H[n-1]
+        return H
     
     # extract values from sim_params
     L = quantsim.sim_params['length']
@@ -91,11 +246,6 @@ def ParabSqWell(quantsim):
     dx = quantsim.sim_params['dx']
     num_of_wfns = quantsim.sim_params['num_modes']
     
-    # init empty arrays
-    wfn_solns, prob_densities = [], []
-
-    x_vals = np.arange(-L, L, dx) 
-    
     # make arrays of constants for each unique wfn
     n_array = np.arange(0, num_of_wfns+1)  # 0 to n+1 to include end point :)
 
@@ -103,33 +253,51 @@ def ParabSqWell(quantsim):
     w = np.sqrt(k/m)  # ang freq
     E_array = (n_array + 0.5) * hbar * w
     
-    # use this scaled x instead of x_vals inside the hermite polynomial
-    xi = np.sqrt(m*w/hbar)*x_vals
+    def qho_grid():
+        # use this scaled x instead of x_vals inside the hermite polynomial,
+        # none of these depend on the mode so they are built once per grid
+        x_vals = np.arange(-L, L, dx) 
+        xi_scale = _get_cached(quantsim, ('xi_scale', m, k), lambda: np.sqrt(m*w/hbar))
+        xi = xi_scale*x_vals
+        exp_decay = np.exp(-0.5*xi*xi)
+        return x_vals, xi, exp_decay
     
-    for n in n_array:
-        # calculate energy for each n
-        En = E_array[n]
-
-        # split the wavefunction into several pieces
-        alpha = 1/np.sqrt(2**n * np.math.factorial(n)) * (m*w/(np.pi*hbar))**0.25
-        
-        exp_decay = np.exp(-(x_vals**2/2) * (m*w/hbar))
-        
-        # calculate final wavefunction
-        #wfn_ampl = alpha * (zeta/np.pi**0.25) * exp_decay * hermite(x_vals,n)
-        wfn_ampl = alpha * exp_decay * hermite(xi, n)
-        
-        # save to soln list
-        wfn_solns.append(wfn_ampl)
-        prob_densities.append(np.power(wfn_ampl, 2))
+    x_vals, xi, exp_decay = _get_cached(quantsim, ('qho_grid', L, dx, m, k), qho_grid)
+    N = x_vals.size
+    
+    def alpha_vec():
+        # normalization 1/sqrt(2^n n!) (m w / pi hbar)^(1/4), done in log space
+        # with gammaln so high n does not overflow
+        log_alpha = 0.25*np.log(m*w/(np.pi*hbar)) - 0.5*(n_array*np.log(2.0) + special.gammaln(n_array+1))
+        return np.exp(log_alpha)
+    
+    alpha = _get_cached(quantsim, ('alpha_vec', m, k, num_of_wfns), alpha_vec)
+    
+    # calculate final wavefunction, one row per mode
+    wfn_solns, prob_densities = _get_buffers(quantsim, (num_of_wfns+1, N))
+    if KERNEL_BACKEND is not None:
+        _qho_kernel(xi, num_of_wfns, alpha, exp_decay, wfn_solns, prob_densities)
+    else:
+        # alpha_n H_n alone can exceed float32 at large xi, so the whole
+        # product is built in double precision and narrowed once at the end
+        H = hermite(xi, num_of_wfns, _get_scratch(quantsim, (num_of_wfns+1, N)))
+        H *= alpha[:, None]
+        H *= exp_decay
+        wfn_solns[...] = H
+        np.square(wfn_solns, out=prob_densities)
 
     # save useful arrays in sim_param dict
     quantsim.sim_params['x_vals'] = x_vals
+    quantsim.sim_params['N'] = N
     quantsim.sim_params['E_array'] = E_array/w
     quantsim.sim_params['ang_freq'] = w
     
     return wfn_solns, prob_densities
 
+# map every accepted name for a system to the method that simulates it, see QuantSim docstring
+_SYS_DISPATCH = {k: InfSqWell for k in ("1", "Infinite Square Well", "ISW")}
+_SYS_DISPATCH.update({k: ParabSqWell for k in ("2", "Quantum Harmonic Oscillator", "QHO")})
+
 def simulate(quantsim):
     
     """
@@ -145,23 +313,63 @@ def simulate(quantsim):
         returns nothing, only updates values inside the QuantSim object
     
     """
-    choice = quantsim.sys
+    handler = _SYS_DISPATCH.get(quantsim.sys)
+    if handler is None:
+        print("\nSystem not found. Please reinitialize object.\n")
+        return
     
-    if choice in ["1", "Infinite Square Well", "ISW"]:
-        soln, prob_dens = InfSqWell(quantsim)
-        quantsim.soln = soln
-        quantsim.prob_dens = prob_dens
+    soln, prob_dens = handler(quantsim)
+    quantsim.soln = soln
+    quantsim.prob_dens = prob_dens
+    
+    return
+
 
-    elif choice in ["2", "Quantum Harmonic Oscillator", "QHO"]:
-        soln, prob_dens = ParabSqWell(quantsim)
-        quantsim.soln = soln
-        quantsim.prob_dens = prob_dens
+''' begin plotting methods '''
+
+def _plot_isw(quantsim, ax):
+    """
+    Draws every InfSqWell mode saved in the quantsim object onto ax, along with the walls of the well.
+    """
+    x_vals = quantsim.sim_params['x_vals']
+    L = quantsim.sim_params['length']
     
-    else:
-        print("\nSystem not found. Please reinitialize object.\n")
+    # plot every wfn solution saved, one row per mode
+    for n, wfn in enumerate(quantsim.soln):
+        ax.plot(x_vals, wfn, label="n={}".format(n+1))
+    
+    # draw well boundaries abusing the fact that the wfns always
+    # are attached to walls, reduce over the whole 2D array so this
+    # also works with a single mode
+    wfn_min, wfn_max = quantsim.soln.min(), quantsim.soln.max()
+    plt.vlines([0, L], wfn_min, wfn_max, color='k', linewidth=4)
+    plt.hlines(wfn_min, 0, L, color='k', linewidth=4)
     
     return
 
+def _plot_qho(quantsim, ax):
+    """
+    Draws every QHO mode saved in the quantsim object onto ax, along with the parabolic potential.
+    """
+    x_vals = quantsim.sim_params['x_vals']
+    energy_levels = quantsim.sim_params['E_array']
+    
+    for n, wfn in enumerate(quantsim.soln):
+        ax.plot(x_vals, wfn, label="{:.1f} $\hbar \omega$".format(energy_levels[n]))
+    
+    # plot parabolic potential 
+    K = quantsim.sim_params['force_constant_k']
+    potential = 0.5 * K * x_vals**2
+    ax.plot(x_vals, potential, color='k', linewidth=3)
+    
+    # misc plotting
+    ax.set_title("Quantum Harmonic Oscillator")
+    
+    return
+
+# same keys as _SYS_DISPATCH, each system has its own plotting method
+_PLOT_DISPATCH = {k: _plot_isw for k in ("1", "Infinite Square Well", "ISW")}
+_PLOT_DISPATCH.update({k: _plot_qho for k in ("2", "Quantum Harmonic Oscillator", "QHO")})
 
 def plot_func(quantsim):
     """
@@ -177,47 +385,19 @@ def plot_func(quantsim):
         returns nothing, only plots
     
     """
-    # extract system and create plot
-    choice = quantsim.sys
+    # extract system plotter before creating the plot
+    handler = _PLOT_DISPATCH.get(quantsim.sys)
+    if handler is None:
+        print("\nSystem not found. Please reinitialize object.\n")
+        return
+    
     fig, ax = plt.subplots(figsize=(12,6))
     ax.axis('off')
     ax.set_ylim(quantsim.sim_params['ylims'])
     ax.set_xlim(quantsim.sim_params['xlims'])
     
-    # take x values, y values, and labels from quantsim object
-    x_vals = quantsim.sim_params['x_vals']
-    wfn_list = quantsim.soln
-    energy_levels = quantsim.sim_params['E_array']
-    L = quantsim.sim_params['length']
-    
     # begin selective plotting
-    # ISW
-    if choice in ["1", "Infinite Square Well", "ISW"]:
-        # plot every wfn solution saved
-        for n, wfn in enumerate(wfn_list):
-            ax.plot(x_vals, wfn, label="n={}".format(n+1))
-        
-        # draw well boundaries abusing the fact that the wfns always
-        # are attached to walls
-        plt.vlines([0, L], min(quantsim.soln[1]), max(quantsim.soln[1]), color='k', linewidth=4)
-        plt.hlines(min(quantsim.soln[1]), 0, L, color='k', linewidth=4)
-    
-    # QHO
-    elif choice in ["2", "Quantum Harmonic Oscillator", "QHO"]:
-        
-        for n, wfn in enumerate(wfn_list):
-            ax.plot(x_vals, wfn, label="{:.1f} $\hbar \omega$".format(energy_levels[n]))
-        
-        # plot parabolic potential 
-        K = quantsim.sim_params['force_constant_k']
-        potential = 0.5 * K * x_vals**2
-        ax.plot(x_vals, potential, color='k', linewidth=3)
-        
-        # misc plotting
-        ax.set_title("Quantum Harmonic Oscillator")
-    
-    else:
-        print("\nSystem not found. Please reinitialize object.\n")
+    handler(quantsim, ax)
         
     ax.legend()
     
@@ -0,0 +1,21 @@
+"""
+Builds the optional compiled kernels in _kernels.pyx. This is not a package install, it only drops the extension next to QuantVisualizer.py:
+
+    python setup.py build_ext --inplace
+
+"""
+
+from setuptools import Extension, setup
+from Cython.Build import cythonize
+
+kernels = Extension(
+    "_kernels",
+    ["_kernels.pyx"],
+    extra_compile_args=["-O3", "-march=native", "-ffast-math"],
+    libraries=["m"],  # -ffast-math vectorizes sin into libm's SIMD variants
+)
+
+setup(
+    name="quantsim-kernels",
+    ext_modules=cythonize([kernels], language_level=3),
+)